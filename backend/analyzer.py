@@ -1,20 +1,79 @@
 ﻿"""Analyzer module - Routes to simple_analyzer for fast analysis"""
 
+import asyncio
+from backend import cache
 from backend.models import ComprehensiveAnalysis, AnalysisSettings
-from typing import Tuple, Dict, Any
+from backend.simple_analyzer import (
+    extract_document, extract_documents_batch, is_cacheable_extraction, postprocess_extraction, prepare_llm_text,
+    EXTRACTION_BATCH_SIZE, EXTRACTION_MODEL, EXTRACTION_PROMPT_VERSION,
+)
+from typing import Tuple, Dict, Any, List, Optional
+
+# Upper bound on batched extraction calls in flight, to stay under provider rate limits.
+BATCH_CONCURRENCY = 8
+
+
+def _extraction_cache_key(text: str) -> str:
+    # The extraction model and prompt version are part of the key, so changing
+    # either one invalidates earlier entries. Provider and analysis settings
+    # are not: extraction always runs on EXTRACTION_MODEL and never sees them.
+    # The text is keyed exactly as the model receives it (prepare_llm_text), so
+    # layout noise such as runs of spaces still hits, while documents that
+    # differ in line structure - which the model and the post-processing scan
+    # both read - get their own entries.
+    return cache.make_key(EXTRACTION_MODEL, EXTRACTION_PROMPT_VERSION, prepare_llm_text(text))
 
 
 def analyze_bmw_1pager(text: str, provider: str = "gemini", settings: AnalysisSettings = None) -> ComprehensiveAnalysis:
     """Main entry point for document analysis."""
-    if settings is None:
-        settings = AnalysisSettings()
-    from backend.simple_analyzer import analyze_document_fast
-    return analyze_document_fast(text)
+    analysis, _ = analyze_bmw_1pager_with_extraction(text, provider=provider, settings=settings)
+    return analysis
 
 
 def analyze_bmw_1pager_with_extraction(text: str, provider: str = "gemini", settings: AnalysisSettings = None) -> Tuple[ComprehensiveAnalysis, Dict[str, Any]]:
     """Analyze document and return both analysis and extraction data for auto-scaling."""
-    if settings is None:
-        settings = AnalysisSettings()
-    from backend.simple_analyzer import analyze_document_fast_with_extraction
-    return analyze_document_fast_with_extraction(text)
+    content, sanitized_text = cache.get_or_compute(
+        _extraction_cache_key(text), lambda: extract_document(text), should_store=is_cacheable_extraction
+    )
+    return postprocess_extraction(content, text, sanitized_text)
+
+
+async def analyze_bmw_1pagers_batch(texts: List[str]) -> List[Tuple[ComprehensiveAnalysis, Dict[str, Any]]]:
+    """Analyze several documents and return (analysis, extraction) pairs in input order.
+
+    Cached extractions are reused directly. The rest are grouped into batches of
+    EXTRACTION_BATCH_SIZE, each extracted with a single row-marshaled LLM call,
+    and the batches run concurrently on the async OpenAI client. Documents a
+    batch response leaves out are retried through the single-document path.
+    Cache reads and writes touch the disk, so they run in a worker thread.
+    """
+    keys = [_extraction_cache_key(text) for text in texts]
+    extractions: List[Optional[Tuple[str, str]]] = await asyncio.to_thread(lambda: [cache.get(key) for key in keys])
+    pending = [i for i, extraction in enumerate(extractions) if extraction is None]
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def _extract(indices: List[int]) -> None:
+        async with semaphore:
+            batch = await extract_documents_batch([texts[i] for i in indices])
+        extracted = [(i, extraction) for i, extraction in zip(indices, batch) if extraction is not None]
+        await asyncio.to_thread(lambda: [
+            cache.put(keys[i], extraction) for i, extraction in extracted if is_cacheable_extraction(extraction)
+        ])
+        for i, extraction in extracted:
+            extractions[i] = extraction
+        # Documents the batch response missed are retried one by one (and
+        # cached) instead of falling back to defaults.
+        for i in indices:
+            if extractions[i] is None:
+                extractions[i] = await asyncio.to_thread(
+                    cache.get_or_compute, keys[i], lambda text=texts[i]: extract_document(text),
+                    is_cacheable_extraction,
+                )
+
+    groups = [pending[n:n + EXTRACTION_BATCH_SIZE] for n in range(0, len(pending), EXTRACTION_BATCH_SIZE)]
+    await asyncio.gather(*(_extract(group) for group in groups))
+    return await asyncio.to_thread(lambda: [
+        postprocess_extraction(content, text, sanitized_text)
+        for text, (content, sanitized_text) in zip(texts, extractions)
+    ])
@@ -0,0 +1,231 @@
+"""Cache of LLM extraction results for document analyses.
+
+Only the expensive step is cached: the raw extraction payload and the
+sanitized text it came from. Post-processing and the calculator re-run on
+every hit, so changes to them take effect immediately instead of being
+masked by stored figures.
+
+Two tiers: a small in-process LRU in front of a size-bounded directory of JSON
+files, so repeat submissions skip the LLM both within a run and across restarts.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Tuple, Dict, Any, Optional, Callable
+
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+# (raw extraction payload, sanitized document text)
+ExtractionResult = Tuple[str, str]
+
+
+class _DiskEntry(TypedDict):
+    content: str
+    sanitized_text: str
+
+
+# Disk entries are parsed and validated in one pydantic-core pass straight
+# from the file bytes, without an intermediate Python dict.
+_DISK_ENTRY = TypeAdapter(_DiskEntry)
+
+MEMORY_CACHE_SIZE = 256
+DISK_CACHE_DIR = Path(".cache") / "extractions"
+# The disk tier is trimmed back to this many entries, least recently used
+# first (file mtime is refreshed on every disk hit). The directory is only
+# scanned every DISK_PRUNE_INTERVAL writes, so it may briefly run over.
+DISK_CACHE_MAX_ENTRIES = 10_000
+DISK_PRUNE_INTERVAL = 100
+
+_memory: "OrderedDict[str, ExtractionResult]" = OrderedDict()
+_lock = threading.Lock()
+# Lookup counters since process start, split by the tier that answered.
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+_writes_since_prune = DISK_PRUNE_INTERVAL  # prune on the first write after start-up
+# Keys currently being computed by get_or_compute, each with an event that is
+# set once the result is stored (or the computation failed).
+_inflight: Dict[str, threading.Event] = {}
+
+
+def make_key(*parts: str) -> str:
+    """BLAKE2b digest over the given parts, NUL-separated so they cannot run together."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _remember(key: str, result: ExtractionResult) -> None:
+    with _lock:
+        _memory[key] = result
+        _memory.move_to_end(key)
+        if len(_memory) > MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+
+def _read_disk(key: str) -> Optional[ExtractionResult]:
+    path = DISK_CACHE_DIR / f"{key}.json"
+    try:
+        entry = _DISK_ENTRY.validate_json(path.read_bytes())
+        result = entry["content"], entry["sanitized_text"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable cache entry {key[:8]}: {e}")
+        return None
+    try:
+        os.utime(path)  # mark as recently used for _prune_disk
+    except OSError:
+        pass
+    return result
+
+
+def _write_disk(key: str, result: ExtractionResult) -> None:
+    content, sanitized_text = result
+    try:
+        DISK_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path = DISK_CACHE_DIR / f"{key}.json"
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(_DISK_ENTRY.dump_json({"content": content, "sanitized_text": sanitized_text}))
+        os.replace(tmp, path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not persist cache entry {key[:8]}: {e}")
+        return
+
+    global _writes_since_prune
+    with _lock:
+        _writes_since_prune += 1
+        due = _writes_since_prune >= DISK_PRUNE_INTERVAL
+        if due:
+            _writes_since_prune = 0
+    if due:
+        _prune_disk()
+
+
+def _prune_disk() -> None:
+    """Delete the least recently used disk entries beyond DISK_CACHE_MAX_ENTRIES."""
+    try:
+        entries = []
+        with os.scandir(DISK_CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    entries.append((entry.stat().st_mtime, entry.path))
+    except OSError as e:
+        print(f"⚠️ Could not scan cache directory: {e}")
+        return
+    excess = len(entries) - DISK_CACHE_MAX_ENTRIES
+    if excess <= 0:
+        return
+    entries.sort()
+    for _, path in entries[:excess]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    print(f"🧹 Evicted {excess} old analysis cache entries from disk")
+
+
+def _count(stat: str) -> None:
+    with _lock:
+        _stats[stat] += 1
+
+
+def stats() -> Dict[str, Any]:
+    """Hit/miss counters and hit rate since process start."""
+    with _lock:
+        snapshot: Dict[str, Any] = dict(_stats)
+        snapshot["entries_in_memory"] = len(_memory)
+    lookups = snapshot["memory_hits"] + snapshot["disk_hits"] + snapshot["misses"]
+    snapshot["hit_rate"] = (snapshot["memory_hits"] + snapshot["disk_hits"]) / lookups if lookups else 0.0
+    return snapshot
+
+
+def _lookup(key: str) -> Tuple[Optional[ExtractionResult], str]:
+    """Find key in memory, then on disk. Returns (result, stat to count); no counting here."""
+    with _lock:
+        result = _memory.get(key)
+        if result is not None:
+            _memory.move_to_end(key)
+            return result, "memory_hits"
+    result = _read_disk(key)
+    if result is None:
+        return None, "misses"
+    _remember(key, result)
+    return result, "disk_hits"
+
+
+def _hit(key: str, result: ExtractionResult, stat: str) -> ExtractionResult:
+    _count(stat)
+    print(f"♻️  Extraction cache hit ({key[:8]}) - skipping LLM extraction")
+    return result
+
+
+def get(key: str) -> Optional[ExtractionResult]:
+    """Return the cached result for key, or None on a miss."""
+    result, stat = _lookup(key)
+    if result is None:
+        _count(stat)
+        return None
+    return _hit(key, result, stat)
+
+
+def put(key: str, result: ExtractionResult) -> None:
+    """Store result in memory and on disk."""
+    _remember(key, result)
+    _write_disk(key, result)
+
+
+def get_or_compute(
+    key: str,
+    compute: Callable[[], ExtractionResult],
+    should_store: Callable[[ExtractionResult], bool] = lambda result: True,
+) -> ExtractionResult:
+    """Return the cached result for key, calling compute() and storing its result on a miss.
+
+    A computed result for which should_store() is false is returned to the
+    caller but not cached, so the next request for the key computes again.
+
+    Concurrent misses on the same key are collapsed: the first caller computes,
+    the others wait for it and then read its result from the cache. If the
+    first caller fails, the waiters compute for themselves. Each call counts
+    once in stats(): waiters served by the first caller count as hits.
+    """
+    result, stat = _lookup(key)
+    if result is not None:
+        return _hit(key, result, stat)
+
+    with _lock:
+        # Check memory again now that we hold the lock: a computation for this
+        # key may have finished (stored, then left _inflight) since the lookup.
+        result = _memory.get(key)
+        pending = _inflight.get(key)
+        if result is None and pending is None:
+            done = _inflight[key] = threading.Event()
+    if result is not None:
+        return _hit(key, result, "memory_hits")
+    if pending is not None:
+        print(f"⏳ Identical analysis already running ({key[:8]}) - waiting for its result")
+        pending.wait()
+        result, stat = _lookup(key)
+        if result is not None:
+            return _hit(key, result, stat)
+        _count("misses")
+        result = compute()
+        if should_store(result):
+            put(key, result)
+        return result
+
+    _count("misses")
+    try:
+        result = compute()
+        if should_store(result):
+            put(key, result)
+        return result
+    finally:
+        with _lock:
+            del _inflight[key]
+        done.set()
@@ -1,8 +1,4 @@
-from backend.models import (
-    ComprehensiveAnalysis, TAMMetrics, SAMMetrics, SOMMetrics,
-    ROIMetrics, TurnoverMetrics, VolumeMetrics, UnitEconomics,
-    EBITMetrics, COGSMetrics, MarketPotential, Variable, Formula
-)
+from backend.models import ComprehensiveAnalysis
 from typing import Dict, Any
 
 def calculate_complete_analysis(extracted: Dict[str, Any]) -> ComprehensiveAnalysis:
@@ -320,53 +316,55 @@ def calculate_complete_analysis(extracted: Dict[str, Any]) -> ComprehensiveAnaly
 
         if is_savings:
             identified_vars = [
-                Variable(name="TAM", value=f"€{tam:,.0f}", description="Annual addressable savings potential"),
-                Variable(name="SAM", value=f"€{sam:,.0f}", description=f"Serviceable savings ({market_cov}% capacity)"),
-                Variable(name="SOM", value=f"€{som:,.0f}", description=f"Achievable annual savings ({take_rate}% execution)")
+                dict(name="TAM", value=f"€{tam:,.0f}", description="Annual addressable savings potential"),
+                dict(name="SAM", value=f"€{sam:,.0f}", description=f"Serviceable savings ({market_cov}% capacity)"),
+                dict(name="SOM", value=f"€{som:,.0f}", description=f"Achievable annual savings ({take_rate}% execution)")
             ]
             identified_vars.extend([
-                Variable(name="Annual Savings (Y1)", value=f"€{som:,.0f}", description="Year 1 achievable savings"),
-                Variable(name="Implementation Cost", value=f"€{dev_cost:,.0f}", description="Estimated upfront implementation"),
-                Variable(name="Growth Rate", value=f"{growth}%", description="Annual savings growth assumption"),
-                Variable(name="5-Year Net Savings", value=f"€{net_profit:,.0f}", description="Cumulative net after costs"),
-                Variable(name="ROI", value=f"{roi_pct:.1f}%", description="Net savings / total cost")
+                dict(name="Annual Savings (Y1)", value=f"€{som:,.0f}", description="Year 1 achievable savings"),
+                dict(name="Implementation Cost", value=f"€{dev_cost:,.0f}", description="Estimated upfront implementation"),
+                dict(name="Growth Rate", value=f"{growth}%", description="Annual savings growth assumption"),
+                dict(name="5-Year Net Savings", value=f"€{net_profit:,.0f}", description="Cumulative net after costs"),
+                dict(name="ROI", value=f"{roi_pct:.1f}%", description="Net savings / total cost")
             ])
             formulas = [
-                Formula(name="SAM Calculation", formula="SAM = TAM × Capacity %", calculation=f"€{tam:,.0f} × {market_cov}% = €{sam:,.0f}"),
-                Formula(name="SOM Calculation", formula="SOM = SAM × Execution %", calculation=f"€{sam:,.0f} × {take_rate}% = €{som:,.0f}"),
-                Formula(name="Implementation Cost", formula="Dev (est) = Y1 Savings × 15%", calculation=f"€{som:,.0f} × 15% = €{dev_cost:,.0f}"),
-                Formula(name="Net Savings", formula="Net = Gross Savings (5Y) - Total Cost (5Y)", calculation=f"€{total_revenue:,.0f} - €{total_cost:,.0f} = €{net_profit:,.0f}"),
-                Formula(name="ROI", formula="ROI = Net ÷ Total Cost", calculation=f"€{net_profit:,.0f} ÷ €{total_cost:,.0f} = {roi_pct:.1f}%")
+                dict(name="SAM Calculation", formula="SAM = TAM × Capacity %", calculation=f"€{tam:,.0f} × {market_cov}% = €{sam:,.0f}"),
+                dict(name="SOM Calculation", formula="SOM = SAM × Execution %", calculation=f"€{sam:,.0f} × {take_rate}% = €{som:,.0f}"),
+                dict(name="Implementation Cost", formula="Dev (est) = Y1 Savings × 15%", calculation=f"€{som:,.0f} × 15% = €{dev_cost:,.0f}"),
+                dict(name="Net Savings", formula="Net = Gross Savings (5Y) - Total Cost (5Y)", calculation=f"€{total_revenue:,.0f} - €{total_cost:,.0f} = €{net_profit:,.0f}"),
+                dict(name="ROI", formula="ROI = Net ÷ Total Cost", calculation=f"€{net_profit:,.0f} ÷ €{total_cost:,.0f} = {roi_pct:.1f}%")
             ]
         else:
             identified_vars = [
-                Variable(name="TAM", value=f"€{tam:,.0f}", description="Total addressable market"),
-                Variable(name="SAM", value=f"€{sam:,.0f}", description=f"Serviceable market ({market_cov}% of TAM)"),
-                Variable(name="SOM", value=f"€{som:,.0f}", description=f"Obtainable market ({take_rate}% of SAM)"),
-                Variable(name="Units (Y1)", value=f"{int(units):,}", description="Projected Year 1 volume")
+                dict(name="TAM", value=f"€{tam:,.0f}", description="Total addressable market"),
+                dict(name="SAM", value=f"€{sam:,.0f}", description=f"Serviceable market ({market_cov}% of TAM)"),
+                dict(name="SOM", value=f"€{som:,.0f}", description=f"Obtainable market ({take_rate}% of SAM)"),
+                dict(name="Units (Y1)", value=f"{int(units):,}", description="Projected Year 1 volume")
             ]
             if price_per_unit:
                 identified_vars.extend([
-                    Variable(name="Price per Unit", value=f"€{price_per_unit:,.2f}", description="Average price"),
-                    Variable(name="COGS per Unit", value=f"€{cogs_per_unit:,.2f}", description="Cost of goods (est 25%)"),
+                    dict(name="Price per Unit", value=f"€{price_per_unit:,.2f}", description="Average price"),
+                    dict(name="COGS per Unit", value=f"€{cogs_per_unit:,.2f}", description="Cost of goods (est 25%)"),
                 ])
             identified_vars.extend([
-                Variable(name="Growth Rate", value=f"{growth}%", description="Annual growth"),
-                Variable(name="ROI", value=f"{roi_pct:.1f}%", description="Return on total cost"),
-                Variable(name="Profit Margin", value=f"{profit_margin:.1f}%", description="Net / Revenue")
+                dict(name="Growth Rate", value=f"{growth}%", description="Annual growth"),
+                dict(name="ROI", value=f"{roi_pct:.1f}%", description="Return on total cost"),
+                dict(name="Profit Margin", value=f"{profit_margin:.1f}%", description="Net / Revenue")
             ])
             formulas = [
-                Formula(name="SAM", formula="SAM = TAM × Coverage %", calculation=f"€{tam:,.0f} × {market_cov}% = €{sam:,.0f}"),
-                Formula(name="SOM", formula="SOM = SAM × Take Rate %", calculation=f"€{sam:,.0f} × {take_rate}% = €{som:,.0f}"),
-                Formula(name="Units", formula="Units = SOM ÷ Price", calculation=f"€{som:,.0f} ÷ €{price_per_unit} = {int(units):,}" if price_per_unit else "Price/unit missing"),
-                Formula(name="Net Profit", formula="Net = Revenue - Total Cost", calculation=f"€{total_revenue:,.0f} - €{total_cost:,.0f} = €{net_profit:,.0f}"),
-                Formula(name="ROI", formula="ROI = Net ÷ Total Cost", calculation=f"€{net_profit:,.0f} ÷ €{total_cost:,.0f} = {roi_pct:.1f}%")
+                dict(name="SAM", formula="SAM = TAM × Coverage %", calculation=f"€{tam:,.0f} × {market_cov}% = €{sam:,.0f}"),
+                dict(name="SOM", formula="SOM = SAM × Take Rate %", calculation=f"€{sam:,.0f} × {take_rate}% = €{som:,.0f}"),
+                dict(name="Units", formula="Units = SOM ÷ Price", calculation=f"€{som:,.0f} ÷ €{price_per_unit} = {int(units):,}" if price_per_unit else "Price/unit missing"),
+                dict(name="Net Profit", formula="Net = Revenue - Total Cost", calculation=f"€{total_revenue:,.0f} - €{total_cost:,.0f} = €{net_profit:,.0f}"),
+                dict(name="ROI", formula="ROI = Net ÷ Total Cost", calculation=f"€{net_profit:,.0f} ÷ €{total_cost:,.0f} = {roi_pct:.1f}%")
             ]
 
-        return ComprehensiveAnalysis(
+        # One validation pass over the whole nested payload (metrics, variables
+        # and formulas) instead of building each sub-model separately.
+        return ComprehensiveAnalysis.model_validate(dict(
             project_name=project_name,
             project_type=project_type,
-            tam=TAMMetrics(
+            tam=dict(
                 description_of_public=("Total addressable savings opportunity" if is_savings else "Total addressable market"),
                 market_size=tam,
                 growth_rate=growth,
@@ -375,14 +373,14 @@ def calculate_complete_analysis(extracted: Dict[str, Any]) -> ComprehensiveAnaly
                 insight=(f"Annual savings potential €{tam/1_000_000:.2f}M" if is_savings else f"Market size €{tam/1_000_000:.2f}M"),
                 confidence=85
             ),
-            sam=SAMMetrics(
+            sam=dict(
                 description_of_public=("Serviceable savings" if is_savings else "Serviceable available market"),
                 market_size=sam,
                 numbers=sam_numbers,
                 justification=("Capacity & organizational constraints" if is_savings else "Market coverage assumption"),
                 insight=f"SAM €{sam/1_000_000:.2f}M", confidence=80, penetration_rate=market_cov
             ),
-            som=SOMMetrics(
+            som=dict(
                 description_of_public=("Achievable annual savings" if is_savings else "Obtainable market share"),
                 market_share=take_rate,
                 revenue_potential=som,
@@ -390,39 +388,39 @@ def calculate_complete_analysis(extracted: Dict[str, Any]) -> ComprehensiveAnaly
                 justification=("Execution realization rate" if is_savings else "Take rate assumption"),
                 insight=f"SOM €{som/1_000_000:.2f}M", confidence=75, customer_acquisition_cost=0
             ),
-            roi=ROIMetrics(
+            roi=dict(
                 revenue=total_revenue, cost=total_cost, roi_percentage=roi_pct,
                 numbers=roi_numbers, payback_period_months=break_even_months,
                 insight=f"ROI {roi_pct:.1f}% | Break-even {break_even_months}m", confidence=80
             ),
-            turnover=TurnoverMetrics(
+            turnover=dict(
                 total_revenue=total_revenue/5, yoy_growth=growth, numbers=yearly_revenue,
                 insight=f"Avg annual {'savings' if is_savings else 'revenue'} €{(total_revenue/5)/1_000_000:.2f}M", confidence=75
             ),
-            volume=VolumeMetrics(
+            volume=dict(
                 units_sold=int(round(units)), numbers=volume_numbers,
                 insight=(f"Context fleet size: {fleet_size:,}" if is_savings and fleet_size else f"Projected volume Y1: {int(units):,}"),
                 confidence=70
             ),
-            unit_economics=UnitEconomics(
+            unit_economics=dict(
                 unit_revenue=price_per_unit, unit_cost=cogs_per_unit,
                 margin=(price_per_unit - cogs_per_unit) if (price_per_unit and not is_savings) else 0,
                 margin_percentage=profit_margin, ltv_cac_ratio=5.0,
                 insight=(f"Savings efficiency {profit_margin:.1f}%" if is_savings else f"Net margin {profit_margin:.1f}%"),
                 confidence=75
             ),
-            ebit=EBITMetrics(
+            ebit=dict(
                 revenue=total_revenue/5, operating_expense=total_cost/5,
                 ebit_margin=net_profit/5, ebit_percentage=profit_margin, numbers=ebit_numbers,
                 insight=f"EBIT margin {profit_margin:.1f}%", confidence=75
             ),
-            cogs=COGSMetrics(
+            cogs=dict(
                 material=0, labor=0, overheads=0, total_cogs=cogs_per_unit * (units if not is_savings else 0),
                 cogs_percentage=((cogs_per_unit / price_per_unit)*100 if price_per_unit and cogs_per_unit else 0),
                 numbers={str(y): yearly_costs[str(y)]['total_cogs'] for y in years},
                 insight=f"COGS per unit €{cogs_per_unit:.2f}", confidence=70
             ),
-            market_potential=MarketPotential(
+            market_potential=dict(
                 market_size=tam, penetration=take_rate, growth_rate=growth, numbers=tam_numbers,
                 insight="Healthy growth outlook", confidence=80
             ),
@@ -459,7 +457,7 @@ def calculate_complete_analysis(extracted: Dict[str, Any]) -> ComprehensiveAnaly
             ),
             identified_variables=identified_vars,
             formulas=formulas
-        )
+        ))
     except Exception as e:
         print("\n❌ CALCULATOR ERROR")
         print(f"Error: {e}")
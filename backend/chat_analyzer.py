@@ -1,21 +1,127 @@
 """
 Enhanced Chatbot for analyzing business cases and modifying simulation parameters
 """
+import logging
 import os
-import json
+import random
 import re
+import threading
+import time
+import orjson
+from functools import lru_cache
 from typing import Dict, Any, Optional, List, Tuple
-from openai import OpenAI
-import google.generativeai as genai
-from backend.config import get_settings
+from backend.config import get_settings, get_openai_client, LLM_MAX_RETRIES
+
+# Response previews and tracebacks go through this logger at DEBUG level, so
+# they are only formatted when settings.debug is on (see main.py).
+logger = logging.getLogger(__name__)
+
+# Typographic quotes the model sometimes emits inside its JSON block, mapped
+# back to ASCII in a single translate() pass before parsing.
+_SMART_QUOTE_TABLE = str.maketrans({"\u201c": '"', "\u201d": '"', "\u2018": "'", "\u2019": "'"})
+
+# Fenced ```json { ... } ``` block carrying the model's parameter modifications.
+_JSON_BLOCK_RE = re.compile(r'```json\s*(\{.*?\})\s*```', re.DOTALL)
+
+
+# The Gemini SDK is imported on first use: it pulls in gRPC/protobuf, and a
+# chat session only needs it when Gemini is the selected provider.
+@lru_cache(maxsize=1)
+def _get_genai():
+    import google.generativeai as genai
+    genai.configure(api_key=get_settings().gemini_api_key)
+    return genai
+
+
+# Per-provider circuit breaker. After BREAKER_FAILURE_THRESHOLD failed calls
+# (each already retried) within BREAKER_WINDOW_SECONDS, the provider is skipped
+# for BREAKER_COOLDOWN_SECONDS and chat goes to the other one. Once the
+# cooldown ends a single trial call is let through while other requests keep
+# failing over; if the trial fails the breaker opens again straight away.
+# Only provider and transport errors count (see _provider_errors).
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_WINDOW_SECONDS = 60.0
+BREAKER_COOLDOWN_SECONDS = 120.0
+_breaker_failures: Dict[str, List[float]] = {"openai": [], "gemini": []}
+_breaker_open_until: Dict[str, float] = {"openai": 0.0, "gemini": 0.0}
+_breaker_trial_running: Dict[str, bool] = {"openai": False, "gemini": False}
+_breaker_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _provider_errors() -> tuple:
+    """Transient provider failures: rate limits, server errors, timeouts, dropped connections.
+
+    Request errors such as a bad API key or an invalid prompt are not among
+    them - failing over would not fix those - and never trip the breaker.
+    """
+    from openai import RateLimitError, InternalServerError, APIConnectionError, APITimeoutError
+    from google.api_core.exceptions import (
+        ResourceExhausted, ServiceUnavailable, DeadlineExceeded, InternalServerError as GoogleInternalServerError,
+    )
+    return (
+        RateLimitError, InternalServerError, APIConnectionError, APITimeoutError,
+        ResourceExhausted, ServiceUnavailable, DeadlineExceeded, GoogleInternalServerError,
+    )
 
-# Get settings
-settings = get_settings()
 
-# Initialize clients
-openai_client = OpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
-if settings.gemini_api_key:
-    genai.configure(api_key=settings.gemini_api_key)
+def _breaker_try_acquire(provider: str) -> Tuple[bool, bool]:
+    """Return (allowed, trial): whether provider may be called now, and whether
+    this call claimed the single half-open trial slot."""
+    with _breaker_lock:
+        open_until = _breaker_open_until[provider]
+        if open_until == 0.0:
+            return True, False
+        if time.monotonic() < open_until or _breaker_trial_running[provider]:
+            return False, False
+        _breaker_trial_running[provider] = True
+        return True, True
+
+
+def _breaker_record(provider: str, success: bool, trial: bool) -> None:
+    now = time.monotonic()
+    with _breaker_lock:
+        if trial:
+            _breaker_trial_running[provider] = False
+        if success:
+            _breaker_failures[provider].clear()
+            _breaker_open_until[provider] = 0.0
+            return
+        half_open = _breaker_open_until[provider] > 0.0
+        failures = [t for t in _breaker_failures[provider] if now - t < BREAKER_WINDOW_SECONDS]
+        failures.append(now)
+        _breaker_failures[provider] = failures
+        if half_open or len(failures) >= BREAKER_FAILURE_THRESHOLD:
+            _breaker_open_until[provider] = now + BREAKER_COOLDOWN_SECONDS
+            failures.clear()
+            print(f"   🔌 {provider} circuit open for {BREAKER_COOLDOWN_SECONDS:.0f}s")
+
+
+def _breaker_release(provider: str, trial: bool) -> None:
+    """Free the trial slot after a call that failed for local reasons, leaving the state as is."""
+    if trial:
+        with _breaker_lock:
+            _breaker_trial_running[provider] = False
+
+
+def _select_chat_provider(provider: str) -> Tuple[str, bool]:
+    """Return (provider, trial) for the call, failing over when the requested one's breaker is open.
+
+    Raises RuntimeError if neither provider can be called right now.
+    """
+    provider = "openai" if provider == "openai" else "gemini"
+    allowed, trial = _breaker_try_acquire(provider)
+    if allowed:
+        return provider, trial
+    fallback = "gemini" if provider == "openai" else "openai"
+    settings = get_settings()
+    fallback_key = settings.gemini_api_key if fallback == "gemini" else settings.openai_api_key
+    if fallback_key:
+        allowed, trial = _breaker_try_acquire(fallback)
+        if allowed:
+            print(f"   🔀 {provider} circuit open - using {fallback} instead")
+            return fallback, trial
+    raise RuntimeError(f"Chat provider {provider} is temporarily unavailable and no fallback is available")
 
 
 def chat_with_analysis(
@@ -55,14 +161,24 @@ def chat_with_analysis(
     
     try:
         # Get AI response
+        provider, trial = _select_chat_provider(provider)
         print(f"\n🚀 Calling {provider.upper()} API...")
-        if provider == "openai":
-            response_text = _call_openai_chat(messages)
-        else:
-            response_text = _call_gemini_chat(messages)
+        try:
+            if provider == "openai":
+                response_text = _call_openai_chat(messages)
+            else:
+                response_text = _call_gemini_chat(messages)
+        except _provider_errors():
+            _breaker_record(provider, success=False, trial=trial)
+            raise
+        except Exception:
+            _breaker_release(provider, trial)
+            raise
+        _breaker_record(provider, success=True, trial=trial)
         
         print(f"✓ Response Received ({len(response_text)} chars)")
-        print(f"📄 Response Preview: {response_text[:200]}...")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Response preview: %s...", response_text[:200])
         
         # Parse for parameter modifications
         print(f"\n🔍 Parsing for parameter modifications...")
@@ -84,8 +200,8 @@ def chat_with_analysis(
         print(f"\n❌ CHAT ERROR:")
         print(f"   Error type: {type(e).__name__}")
         print(f"   Error message: {str(e)}")
-        import traceback
-        print(f"   Traceback:\n{traceback.format_exc()}")
+        # The chat route logs the full traceback when it turns this into a 500.
+        logger.debug("Chat analyzer traceback", exc_info=True)
         print("="*100 + "\n")
         raise
 
@@ -140,12 +256,10 @@ def _build_context_summary(analysis_context: Dict[str, Any]) -> str:
     return result
 
 
-def _create_chat_system_prompt(context_summary: str) -> str:
-    """Create the system prompt for the chatbot"""
-    return f"""You are an expert business analyst assistant helping users understand and optimize their business case analysis.
-
-CURRENT ANALYSIS CONTEXT:
-{context_summary}
+# Static part of the chat system prompt. Built once at import; the per-request
+# analysis context is appended after it so the prefix stays identical between
+# calls and providers can serve it from their prompt cache.
+CHAT_SYSTEM_INSTRUCTIONS = """You are an expert business analyst assistant helping users understand and optimize their business case analysis.
 
 YOUR CAPABILITIES:
 1. Answer questions about the current analysis
@@ -157,12 +271,12 @@ PARAMETER MODIFICATION:
 When a user wants to change parameters for simulation, respond with your explanation AND include a JSON block at the end of your response in this EXACT format:
 
 ```json
-{{
-  "modifications": {{
+{
+  "modifications": {
     "parameter_name": new_value,
     "another_parameter": new_value
-  }}
-}}
+  }
+}
 ```
 
 AVAILABLE PARAMETERS TO MODIFY:
@@ -200,6 +314,11 @@ GUIDELINES:
 """
 
 
+def _create_chat_system_prompt(context_summary: str) -> str:
+    """Create the system prompt for the chatbot"""
+    return CHAT_SYSTEM_INSTRUCTIONS + "\nCURRENT ANALYSIS CONTEXT:\n" + context_summary + "\n"
+
+
 def _build_message_history(
     system_prompt: str,
     current_message: str,
@@ -220,18 +339,30 @@ def _build_message_history(
     return messages
 
 
+# Upper bound on a chat reply, applied to both providers. Replies are a few
+# paragraphs plus an optional modifications block; without a cap Gemini
+# would fall back to the model's much larger default.
+CHAT_MAX_OUTPUT_TOKENS = 1500
+
+# Fixed per-provider request settings, built once rather than on every call.
+OPENAI_CHAT_MODEL = "gpt-4o-mini"
+OPENAI_CHAT_TEMPERATURE = 0.7
+GEMINI_CHAT_MODEL = "gemini-1.5-flash"
+GEMINI_GENERATION_CONFIG = {"max_output_tokens": CHAT_MAX_OUTPUT_TOKENS}
+
+
 def _call_openai_chat(messages: List[Dict[str, str]]) -> str:
     """Call OpenAI Chat API"""
     print("   📡 Calling OpenAI API...")
     
-    if not openai_client:
+    if not get_settings().openai_api_key:
         raise ValueError("OpenAI API key not configured")
     
-    response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
+    response = get_openai_client().chat.completions.create(
+        model=OPENAI_CHAT_MODEL,
         messages=messages,
-        temperature=0.7,
-        max_tokens=1500
+        temperature=OPENAI_CHAT_TEMPERATURE,
+        max_tokens=CHAT_MAX_OUTPUT_TOKENS
     )
     
     result = response.choices[0].message.content.strip()
@@ -243,7 +374,7 @@ def _call_gemini_chat(messages: List[Dict[str, str]]) -> str:
     """Call Gemini Chat API"""
     print("   📡 Calling Gemini API...")
     
-    if not settings.gemini_api_key:
+    if not get_settings().gemini_api_key:
         raise ValueError("Gemini API key not configured")
     
     # Convert messages to Gemini format
@@ -259,19 +390,48 @@ def _call_gemini_chat(messages: List[Dict[str, str]]) -> str:
                 "parts": [msg["content"]]
             })
     
-    model = genai.GenerativeModel(
-        model_name="gemini-1.5-flash",
-        system_instruction=system_instruction
-    )
-    
-    chat = model.start_chat(history=gemini_messages[:-1] if len(gemini_messages) > 1 else [])
-    response = chat.send_message(gemini_messages[-1]["parts"][0])
+    chat = _gemini_chat_model(system_instruction).start_chat(history=gemini_messages[:-1] if len(gemini_messages) > 1 else [])
+    response = _send_gemini_with_retries(chat, gemini_messages[-1]["parts"][0])
     
     result = response.text.strip()
     print(f"   ✓ Gemini response received")
     return result
 
 
+# A conversation resends the same system prompt (instructions plus analysis
+# context) on every turn, so the model object built for it is reused.
+@lru_cache(maxsize=8)
+def _gemini_chat_model(system_instruction: Optional[str]):
+    return _get_genai().GenerativeModel(
+        model_name=GEMINI_CHAT_MODEL,
+        system_instruction=system_instruction,
+        generation_config=GEMINI_GENERATION_CONFIG
+    )
+
+
+def _send_gemini_with_retries(chat, content: str):
+    """Send a Gemini chat message, retrying transient failures with exponential backoff and jitter.
+
+    The Gemini SDK has no built-in retry, unlike the OpenAI client (see LLM_MAX_RETRIES).
+    """
+    from google.api_core import exceptions as google_exceptions
+    transient = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+    )
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            return chat.send_message(content)
+        except transient as e:
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            delay = random.uniform(0, min(30, 2 ** (attempt + 1)))
+            print(f"   ⏳ Gemini {type(e).__name__}, retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+
 def _extract_parameter_modifications(
     user_message: str,
     ai_response: str,
@@ -290,15 +450,15 @@ def _extract_parameter_modifications(
         return {"__revert": True}
     
     # First, try to extract JSON block from AI response
-    json_match = re.search(r'```json\s*(\{.*?\})\s*```', ai_response, re.DOTALL)
+    json_match = _JSON_BLOCK_RE.search(ai_response)
     if json_match:
         print("   ✓ Found JSON modification block in AI response")
         try:
-            parsed = json.loads(json_match.group(1))
+            parsed = orjson.loads(json_match.group(1).translate(_SMART_QUOTE_TABLE))
             if "modifications" in parsed:
                 modifications = parsed["modifications"]
                 print(f"   ✓ Parsed {len(modifications)} modifications from JSON")
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             print(f"   ⚠️  JSON parse error: {e}")
     
     # Also try to infer from user message using pattern matching
@@ -435,6 +595,16 @@ def _infer_modifications_from_message(
     return modifications
 
 
+# Parameter names the generic set/assign/increase/decrease parser accepts,
+# including the aliases normalized to fleet_size_or_units.
+_FLEET_ALIASES = frozenset({'volume', 'fleet', 'units', 'fleet_size'})
+_KNOWN_PARAMS = frozenset({
+    'growth_rate', 'development_cost', 'royalty_percentage', 'take_rate', 'market_coverage',
+    'annual_revenue_or_savings', 'fleet_size_or_units', 'price_per_unit', 'TAM', 'SAM', 'SOM',
+    'volume', 'fleet', 'units',
+})
+
+
 def _parse_generic_parameter_adjustments(message: str, analysis_context: Dict[str, Any]) -> Dict[str, Any]:
     """Parse generic 'set', '=', 'increase/decrease' patterns for any known parameter.
     Supports:
@@ -447,11 +617,6 @@ def _parse_generic_parameter_adjustments(message: str, analysis_context: Dict[st
       - set TAM to 10 million (handled later by semantic mapper)
     Returns raw modifications (semantic mapping handled separately).
     """
-    known_params = [
-        'growth_rate', 'development_cost', 'royalty_percentage', 'take_rate', 'market_coverage',
-        'annual_revenue_or_savings', 'fleet_size_or_units', 'price_per_unit', 'TAM', 'SAM', 'SOM',
-        'volume', 'fleet', 'units'  # Aliases for fleet_size_or_units
-    ]
     msg = message.lower()
     mods: Dict[str, Any] = {}
 
@@ -473,7 +638,7 @@ def _parse_generic_parameter_adjustments(message: str, analysis_context: Dict[st
     # Normalize aliases to canonical param names
     def normalize_param(param: str) -> str:
         param = param.strip().replace(' ', '_')
-        if param in ['volume', 'fleet', 'units', 'fleet_size']:
+        if param in _FLEET_ALIASES:
             return 'fleet_size_or_units'
         return param
     
@@ -481,7 +646,7 @@ def _parse_generic_parameter_adjustments(message: str, analysis_context: Dict[st
     set_pattern = re.compile(r'(set|change|update)\s+([a-z_ ]+)\s+(?:to|=|to\s+be)\s*([\d.,]+(?:\s*million|\s*m|\s*k|%|))', re.IGNORECASE)
     for verb, param_raw, value_raw in set_pattern.findall(message):
         param = normalize_param(param_raw.strip())
-        if param in known_params or param == 'fleet_size_or_units':
+        if param in _KNOWN_PARAMS:
             value = value_raw.strip()
             is_percent = value.endswith('%')
             value = value.rstrip('%').strip()
@@ -515,7 +680,7 @@ def _parse_generic_parameter_adjustments(message: str, analysis_context: Dict[st
     assign_pattern = re.compile(r'\b([a-z_]{3,})\s*=\s*([\d.,]+(?:\s*million|\s*m|\s*k|%|))', re.IGNORECASE)
     for param_raw, value_raw in assign_pattern.findall(message):
         param = normalize_param(param_raw.strip())
-        if param in known_params or param == 'fleet_size_or_units':
+        if param in _KNOWN_PARAMS:
             value = value_raw.strip()
             is_percent = value.endswith('%')
             value = value.rstrip('%').strip()
@@ -555,7 +720,7 @@ def _parse_generic_parameter_adjustments(message: str, analysis_context: Dict[st
     incdec_pattern = re.compile(r'(increase|decrease)\s+([a-z_ ]+)\s+by\s+([\d.,]+(?:\s*million|\s*m|\s*k|%|))', re.IGNORECASE)
     for action, param_raw, value_raw in incdec_pattern.findall(message):
         param = param_raw.strip().replace(' ', '_')
-        if param in known_params:
+        if param in _KNOWN_PARAMS:
             value = value_raw.strip()
             is_percent = value.endswith('%')
             value = value.rstrip('%').strip()
@@ -603,6 +768,21 @@ def _parse_generic_parameter_adjustments(message: str, analysis_context: Dict[st
     return mods
 
 
+# Accepted (min, max, type) for every parameter the chat may modify; None
+# means unbounded. Checked with one dict lookup per key instead of an
+# if/elif chain.
+_MODIFICATION_BOUNDS = {
+    'growth_rate': (0, 100, float),
+    'development_cost': (0, None, float),
+    'royalty_percentage': (0, 100, float),
+    'take_rate': (0, 100, float),
+    'market_coverage': (0, 100, float),
+    'annual_revenue_or_savings': (0, None, float),
+    'fleet_size_or_units': (0, None, int),
+    'price_per_unit': (0, None, float),
+}
+
+
 def _validate_modifications(
     modifications: Dict[str, Any],
     analysis_context: Dict[str, Any]
@@ -621,24 +801,13 @@ def _validate_modifications(
             continue
         
         # Validate ranges
-        if key == 'growth_rate' and 0 <= value <= 100:
-            valid[key] = value
-        elif key == 'development_cost' and value >= 0:
-            valid[key] = value
-        elif key == 'royalty_percentage' and 0 <= value <= 100:
-            valid[key] = value
-        elif key == 'take_rate' and 0 <= value <= 100:
-            valid[key] = value
-        elif key == 'market_coverage' and 0 <= value <= 100:
-            valid[key] = value
-        elif key == 'annual_revenue_or_savings' and value >= 0:
-            valid[key] = value
-        elif key == 'fleet_size_or_units' and value >= 0:
-            valid[key] = int(value)
-        elif key == 'price_per_unit' and value >= 0:
-            valid[key] = value
-        else:
-            print(f"   ⚠️  Skipping {key}: out of valid range or unknown parameter")
+        bounds = _MODIFICATION_BOUNDS.get(key)
+        if bounds is not None:
+            low, high, cast = bounds
+            if value >= low and (high is None or value <= high):
+                valid[key] = cast(value)
+                continue
+        print(f"   ⚠️  Skipping {key}: out of valid range or unknown parameter")
     
     return valid
 
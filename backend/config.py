@@ -15,6 +15,9 @@ class Settings(BaseSettings):
     openai_api_key: str
     secret_key: str
     debug: bool = True
+    # Documents longer than this are truncated before being sent to the LLM
+    # (~12k tokens); the key figures of a 1-pager sit well within it.
+    max_input_chars: int = 48000
     gemini_model_name: str
     openai_model_name: str
 
@@ -22,3 +25,27 @@ class Settings(BaseSettings):
 @lru_cache()
 def get_settings():
     return Settings()
+
+
+# Attempts after the first on transient provider failures (429, 5xx,
+# timeouts, dropped connections), with exponential backoff and jitter.
+LLM_MAX_RETRIES = 4
+# Per-attempt request timeout in seconds, so a stalled connection fails into
+# the retry path instead of holding a worker indefinitely. Comfortably above
+# the slowest expected call (a full extraction batch).
+LLM_TIMEOUT_SECONDS = 60.0
+
+
+# Process-wide LLM clients, shared by extraction and chat so every request
+# reuses the same HTTP connection pool (and its kept-alive TLS sessions).
+# The OpenAI SDK applies LLM_MAX_RETRIES and LLM_TIMEOUT_SECONDS itself.
+@lru_cache(maxsize=1)
+def get_openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=get_settings().openai_api_key, max_retries=LLM_MAX_RETRIES, timeout=LLM_TIMEOUT_SECONDS)
+
+
+@lru_cache(maxsize=1)
+def get_async_openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=get_settings().openai_api_key, max_retries=LLM_MAX_RETRIES, timeout=LLM_TIMEOUT_SECONDS)
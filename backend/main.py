@@ -1,8 +1,22 @@
+import asyncio
+import logging
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from backend.database import Database
 from backend.routes import router
+from backend.config import get_settings, get_openai_client
+from backend.simple_analyzer import warm_up_sanitizer
+from backend import cache
+
+# The backend modules log through "backend.*" loggers. Debug output (raw LLM
+# responses, calculator input, chat tracebacks) follows settings.debug.
+_backend_logger = logging.getLogger("backend")
+_backend_logger.setLevel(logging.DEBUG if get_settings().debug else logging.INFO)
+if not _backend_logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+    _backend_logger.addHandler(_log_handler)
 
 app = FastAPI(
     title="Quant - Market Intelligence Platform",
@@ -21,7 +35,7 @@ app.add_middleware(
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "Quant Market Intelligence"}
+    return {"status": "healthy", "service": "Quant Market Intelligence", "analysis_cache": cache.stats()}
 
 # Include API routes
 app.include_router(router)
@@ -33,6 +47,10 @@ app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
 @app.on_event("startup")
 async def startup_event():
     Database.connect()
+    # Build the cached LLM client and load the spaCy sanitization model in the
+    # background so the first analysis request doesn't pay for either.
+    app.state.llm_warmup = asyncio.create_task(asyncio.to_thread(get_openai_client))
+    app.state.nlp_warmup = asyncio.create_task(asyncio.to_thread(warm_up_sanitizer))
 
 
 @app.on_event("shutdown")
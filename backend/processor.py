@@ -5,17 +5,13 @@ from docx import Document
 
 def extract_text_from_pdf(file_content: bytes) -> str:
     pdf_reader = PdfReader(BytesIO(file_content))
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text()
-    return text
+    # Form feed marks page boundaries, so repeated page headers/footers can be
+    # recognised downstream (see simple_analyzer._compress_text).
+    return "\n\f".join(page.extract_text() for page in pdf_reader.pages)
 
 def extract_text_from_docx(file_content: bytes) -> str:
     doc = Document(BytesIO(file_content))
-    text = ""
-    for paragraph in doc.paragraphs:
-        text += paragraph.text + "\n"
-    return text
+    return "".join(paragraph.text + "\n" for paragraph in doc.paragraphs)
 
 def filter_sensitive_data(text: str) -> str:
     filtered = text
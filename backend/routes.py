@@ -1,5 +1,6 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Body
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
 from backend.processor import process_file
 from backend.analyzer import analyze_bmw_1pager, analyze_bmw_1pager_with_extraction
@@ -11,7 +12,6 @@ from backend.calculator import calculate_complete_analysis
 from backend.chat_analyzer import chat_with_analysis
 from backend.excel_exporter import ExcelExporter
 from typing import Optional, Dict, Any, List
-import json
 import re
 
 router = APIRouter(prefix="/api", tags=["documents"])
@@ -67,9 +67,8 @@ async def upload_document(
         settings = None
         if settings_json:
             try:
-                settings_dict = json.loads(settings_json)
-                settings = AnalysisSettings(**settings_dict)
-                print(f"⚙️  Settings loaded: {settings_dict}")
+                settings = AnalysisSettings.model_validate_json(settings_json)
+                print(f"⚙️  Settings loaded: {settings_json}")
             except Exception as e:
                 print(f"❌ Settings parse error: {e}")
                 raise HTTPException(status_code=400, detail=f"Invalid settings: {str(e)}")
@@ -80,12 +79,16 @@ async def upload_document(
         print(f"✓ File read: {len(file_content)} bytes")
         
         print(f"\n📝 Processing file ({file_type})...")
-        text = process_file(file_content, file_type)
+        # Parsing and the LLM round-trip are blocking, so they run on the
+        # threadpool and the event loop keeps serving other requests meanwhile.
+        text = await run_in_threadpool(process_file, file_content, file_type)
         print(f"✓ Text extracted: {len(text)} characters")
         print(f"   Preview: {text[:200]}...")
         
         print(f"\n🧠 Starting analysis...")
-        analysis, extraction_data = analyze_bmw_1pager_with_extraction(text, provider=provider, settings=settings)
+        analysis, extraction_data = await run_in_threadpool(
+            analyze_bmw_1pager_with_extraction, text, provider=provider, settings=settings
+        )
         print(f"✓ Analysis completed")
         
         print(f"\n📊 Generating title...")
@@ -140,7 +143,8 @@ async def analyze_text(request: TextAnalysisRequest):
         raise HTTPException(status_code=400, detail="Provider must be 'gemini' or 'openai'")
     
     try:
-        analysis, extraction_data = analyze_bmw_1pager_with_extraction(
+        analysis, extraction_data = await run_in_threadpool(
+            analyze_bmw_1pager_with_extraction,
             text=request.text,
             provider=request.provider,
             settings=request.settings
@@ -406,7 +410,10 @@ async def chat_endpoint(request: ChatRequest):
             )
         
         print(f"\n🧠 Processing chat message...")
-        response_text, modifications = chat_with_analysis(
+        # Blocking provider call (with retries), so it runs on the threadpool
+        # like the analysis routes.
+        response_text, modifications = await run_in_threadpool(
+            chat_with_analysis,
             message=request.message,
             analysis_context=request.analysis_context,
             provider=request.provider,
@@ -462,7 +469,7 @@ async def chat_endpoint(request: ChatRequest):
         print(f"\n✅ SUCCESS - Returning chat response")
         print("="*100 + "\n")
         
-        return ChatResponse(**result)
+        return ChatResponse.model_validate(result)
         
     except Exception as e:
         print(f"\n❌ CHAT ERROR:")
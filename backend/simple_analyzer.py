@@ -1,26 +1,82 @@
-from openai import OpenAI
-from backend.config import get_settings
+from backend.config import get_settings, get_openai_client, get_async_openai_client
 from backend.calculator import calculate_complete_analysis
 from backend.models import ComprehensiveAnalysis
-from datetime import datetime
 from pathlib import Path
-import json
+import logging
+import orjson
+import os
 import re
-import spacy
+import itertools
+import threading
+import time
+import asyncio
 import copy
-from typing import Dict, Any, Tuple, List
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Tuple, List, Optional
+
+# Full payload dumps (document previews, raw LLM responses, calculator input)
+# go through this logger at DEBUG level, so their formatting is skipped
+# entirely unless settings.debug is on (main.py sets the "backend" log level).
+logger = logging.getLogger(__name__)
+
+# Debug/audit artifacts (PreLLM/, Json_Results/) are written by one background
+# thread, so the request path never waits on the disk and the writes stay
+# serialized.
+_SAVE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifact-writer")
+
+
+PRELLM_DIR = Path("PreLLM")
+RESULTS_DIR = Path("Json_Results")
+
+
+@lru_cache(maxsize=None)
+def _artifact_dir(path: Path) -> Path:
+    """Create an artifact directory on first use; later calls skip the mkdir syscall."""
+    path.mkdir(exist_ok=True)
+    return path
+
+
+# Per-process sequence appended to artifact names. Batches and concurrent
+# requests write several documents within the same second, and a bare
+# timestamp would let them overwrite each other's files.
+_artifact_seq = itertools.count(1)
+
+
+def _timestamp() -> str:
+    """Unique artifact name stamp: the current second plus a sequence number."""
+    return f"{time.strftime('%Y%m%d_%H%M%S')}_{next(_artifact_seq):04d}"
+
+
+def _write_artifact(path: Path, data: bytes) -> None:
+    # Pre-encoded bytes written with raw os calls: no buffered file object or
+    # text encoder, a single write() for these small files.
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+    except OSError as e:
+        print(f"⚠️ Failed to write {path}: {e}")
+
+
+def _save_artifact(path: Path, data: bytes) -> None:
+    """Queue data to be written to path on the background writer thread."""
+    _SAVE_POOL.submit(_write_artifact, path, data)
 
 
 def dump_pre_llm(content: str, name_prefix: str = "prompt") -> Path:
     """Write the given content to a timestamped .txt file inside PreLLM folder and return the path."""
     try:
-        out_dir = Path("PreLLM")
-        out_dir.mkdir(exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_dir = _artifact_dir(PRELLM_DIR)
+        timestamp = _timestamp()
         filename = f"{name_prefix}_{timestamp}.txt"
         path = out_dir / filename
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(content)
+        _save_artifact(path, content.encode("utf-8"))
         print(f"✓ Pre-LLM content dumped: {path}")
         return path
     except Exception as e:
@@ -28,14 +84,34 @@ def dump_pre_llm(content: str, name_prefix: str = "prompt") -> Path:
         return None
 
 
-# Load multilingual spaCy model once at module import
-try:
-    nlp = spacy.load("xx_sent_ud_sm")
-    print("✓ spaCy multilingual model 'xx_sent_ud_sm' loaded for sanitization")
-except Exception as e:
-    nlp = None
-    print(f"⚠️ Could not load spaCy model 'xx_sent_ud_sm': {e}\n"+
-          "Sanitization will be disabled. Run: python -m spacy download xx_sent_ud_sm")
+# Load multilingual spaCy model once. Not at import - spaCy and its model add
+# seconds to process start-up - but in the background from the app's startup
+# hook (warm_up_sanitizer), so requests normally find it ready. The lock makes
+# concurrent first callers wait for a single load instead of each loading it.
+_NLP_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _load_nlp():
+    try:
+        import spacy
+        nlp = spacy.load("xx_sent_ud_sm")
+        print("✓ spaCy multilingual model 'xx_sent_ud_sm' loaded for sanitization")
+        return nlp
+    except Exception as e:
+        print(f"⚠️ Could not load spaCy model 'xx_sent_ud_sm': {e}\n"+
+              "Sanitization will be disabled. Run: python -m spacy download xx_sent_ud_sm")
+        return None
+
+
+def _get_nlp():
+    with _NLP_LOCK:
+        return _load_nlp()
+
+
+def warm_up_sanitizer() -> None:
+    """Load the spaCy sanitization model ahead of the first request."""
+    _get_nlp()
 
 # A small, configurable list of exact company names to redact (case-insensitive).
 # Add more company names here if you want them always redacted.
@@ -43,6 +119,22 @@ COMPANY_NAMES = [
     "BMW",
 ]
 
+# Common company tokens (suffixes) to redact when present
+COMPANY_REGEXES = [
+    r"\bGmbH\b",
+    r"\bAG\b",
+    r"\bInc\b",
+    r"\bLLC\b",
+    r"\bCorp(?:oration)?\b",
+]
+
+# Names match case-insensitively, suffixes only in their usual casing. Both
+# are joined into a single alternation so a text is scanned once, not once per
+# pattern.
+_COMPANY_RE = re.compile("|".join(
+    [rf"(?i:\b{re.escape(name)}\b)" for name in COMPANY_NAMES] + COMPANY_REGEXES
+))
+
 
 def _sanitize_text_string(text: str) -> str:
     """Sanitize a plain text string using spaCy NER. Masks PERSON, ORG, and GPE.
@@ -56,6 +148,7 @@ def _sanitize_text_string(text: str) -> str:
     spans: List[tuple] = []
 
     # spaCy NER spans
+    nlp = _get_nlp()
     if nlp:
         try:
             doc = nlp(text)
@@ -66,32 +159,9 @@ def _sanitize_text_string(text: str) -> str:
             # If spaCy fails for any reason, continue with regex-only redaction
             pass
 
-    # Regex-based company and acronym patterns
-    # Common company tokens and all-caps acronyms
-    # First, redact specific company names (case-insensitive)
-    company_name_patterns = [rf"\b{re.escape(name)}\b" for name in COMPANY_NAMES]
-    for pattern in company_name_patterns:
-        try:
-            for m in re.finditer(pattern, text, flags=re.IGNORECASE):
-                spans.append((m.start(), m.end()))
-        except re.error:
-            continue
-
-    # Common company tokens (suffixes) to redact when present
-    COMPANY_REGEXES = [
-        r"\bGmbH\b",
-        r"\bAG\b",
-        r"\bInc\b",
-        r"\bLLC\b",
-        r"\bCorp(?:oration)?\b",
-    ]
-
-    for pattern in COMPANY_REGEXES:
-        try:
-            for m in re.finditer(pattern, text):
-                spans.append((m.start(), m.end()))
-        except re.error:
-            continue
+    # Company names and legal-form suffixes, found in one pass
+    for m in _COMPANY_RE.finditer(text):
+        spans.append((m.start(), m.end()))
 
     # Merge overlapping/adjacent spans
     def _merge_spans(spans_list: List[tuple]) -> List[tuple]:
@@ -143,15 +213,56 @@ def sanitize_extracted_data(extracted: Dict[str, Any]) -> Tuple[Dict[str, Any],
     sanitized_copy = _sanitize_value(original_copy)
     return original_copy, sanitized_copy
 
-def get_minimal_extraction_prompt(text: str) -> str:
-    return f"""Extract ONLY these financial metrics from the business document. Return valid JSON only.
 
-DOCUMENT:
-{text}
+# Model used for extraction, and a version tag for the instructions + schema
+# below. Bump EXTRACTION_PROMPT_VERSION whenever either changes: it is part of
+# the analysis cache key, so stale results from the old prompt are not reused.
+EXTRACTION_MODEL = "gpt-4o-mini"
+EXTRACTION_PROMPT_VERSION = "3"
+# Output budget per document. A fully populated extraction object is well
+# under 200 tokens; the schema is enforced server-side, so the headroom only
+# has to cover long stream_values arrays.
+EXTRACTION_MAX_TOKENS = 400
+
+# JSON schema enforced through OpenAI structured outputs. The response shape is
+# guaranteed server-side, so it no longer has to be spelled out in the prompt.
+_NULLABLE_NUMBER = {"type": ["number", "null"]}
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "project_name": {"type": ["string", "null"]},
+        # Always one of the business models, as in the original prompt skeleton;
+        # the calculator has no branch for an unknown type.
+        "project_type": {
+            "type": "string",
+            "enum": ["savings", "one_time_sale", "subscription", "royalty", "mixed"],
+        },
+        "annual_revenue_or_savings": _NULLABLE_NUMBER,
+        "fleet_size_or_units": _NULLABLE_NUMBER,
+        "price_per_unit": _NULLABLE_NUMBER,
+        "stream_values": {"type": ["array", "null"], "items": {"type": "number"}},
+        "development_cost": _NULLABLE_NUMBER,
+        "growth_rate": _NULLABLE_NUMBER,
+        "royalty_percentage": _NULLABLE_NUMBER,
+        "take_rate": _NULLABLE_NUMBER,
+        "market_coverage": _NULLABLE_NUMBER,
+    },
+    "required": [
+        "project_name", "project_type", "annual_revenue_or_savings", "fleet_size_or_units",
+        "price_per_unit", "stream_values", "development_cost", "growth_rate",
+        "royalty_percentage", "take_rate", "market_coverage",
+    ],
+    "additionalProperties": False,
+}
+
+# Static extraction instructions. They are sent ahead of the document as a
+# separate system message and never interpolated, so every request shares a
+# byte-identical prefix that the provider's prompt cache can reuse.
+EXTRACTION_INSTRUCTIONS = """Extract ONLY these financial metrics from the business document. Return valid JSON only.
 
 EXTRACT (use null if not found):
 1. project_name: Project title
-2. project_type: Identify the business model:
+2. project_type: Identify the business model (never null - pick the closest):
    - "savings" if document mentions cost reduction/efficiency/avoiding costs
    - "one_time_sale" if selling products once (cars, hardware, equipment)
    - "subscription" if recurring revenue (SaaS, membership, monthly fees)
@@ -172,45 +283,371 @@ IMPORTANT INSTRUCTIONS:
 - For development_cost: Add up any mentioned costs for studies, software, implementation, training
 - If costs aren't specified but project needs implementation, estimate 10-20% of annual value
 - Growth rate: Look for phrases like "5% annual growth", "CAGR", "year-over-year increase"
+"""
+
+
+def get_minimal_extraction_prompt(text: str) -> str:
+    """Build the dynamic part of the extraction request (the document itself).
+
+    The instructions live in EXTRACTION_INSTRUCTIONS and go first as the system
+    message; only this suffix changes between calls.
+    """
+    return f"DOCUMENT:\n{text}"
+
+
+# Row-marshaled variant: several documents share one request. Each element of
+# "analyses" is a regular extraction object tagged with the doc_id it belongs to.
+BATCH_EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analyses": {
+            "type": "array",
+            "items": {
+                **EXTRACTION_SCHEMA,
+                "properties": {"doc_id": {"type": "integer"}, **EXTRACTION_SCHEMA["properties"]},
+                "required": ["doc_id", *EXTRACTION_SCHEMA["required"]],
+            },
+        },
+    },
+    "required": ["analyses"],
+    "additionalProperties": False,
+}
+
+BATCH_EXTRACTION_INSTRUCTIONS = """The input contains several independent documents, each wrapped in <doc id="N">...</doc>.
+Extract the metrics for EACH document separately, never mixing figures between documents.
+Return one entry in "analyses" per document, with doc_id set to that document's id."""
+
+# Documents per batched extraction call. Beyond ~4 the longer generation starts
+# to outweigh the round-trips saved.
+EXTRACTION_BATCH_SIZE = 4
+
+
+def get_batch_extraction_prompt(texts: List[str]) -> str:
+    """Build the dynamic part of a batched extraction request."""
+    return "\n\n".join(f'<doc id="{i}">\n{text}\n</doc>' for i, text in enumerate(texts))
+
+
+def _is_blank(text: str) -> bool:
+    """True for documents without a single letter or digit, which have nothing to extract.
+
+    Covers empty uploads as well as image-only PDFs, whose text layer is just
+    whitespace, page breaks and stray punctuation.
+    """
+    return not any(c.isalnum() for c in text)
+
+
+_INLINE_SPACE_RE = re.compile(r"[ \t\f\v\xa0]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+# The first and last lines of each page (pages are separated by "\f", see
+# processor.extract_text_from_pdf) are header/footer candidates. A candidate
+# that appears on more than REPEATED_LINE_LIMIT pages is kept only once; lines
+# inside a page are never dropped, so repeated table labels survive.
+PAGE_EDGE_LINES = 1
+REPEATED_LINE_LIMIT = 2
+
+
+def _compress_text(text: str) -> str:
+    """Drop layout noise from extracted document text before it is sent to the LLM.
+
+    Collapses runs of spaces and blank lines left by PDF/DOCX extraction and
+    removes repeats of lines that head or foot every page (confidentiality
+    notices, document titles). Line structure is kept, since tables and
+    labelled figures depend on it.
+    """
+    pages = [[_INLINE_SPACE_RE.sub(" ", line).strip() for line in page.split("\n")] for page in text.split("\f")]
+    page_edges = []
+    for lines in pages:
+        non_blank = [n for n, line in enumerate(lines) if line]
+        page_edges.append(set(non_blank[:PAGE_EDGE_LINES] + non_blank[-PAGE_EDGE_LINES:]))
+    counts = Counter(
+        line for lines, edges in zip(pages, page_edges) for line in {lines[n] for n in edges}
+    )
+    seen = set()
+    kept = []
+    for lines, edges in zip(pages, page_edges):
+        for n, line in enumerate(lines):
+            if n in edges and counts[line] > REPEATED_LINE_LIMIT:
+                if line in seen:
+                    continue
+                seen.add(line)
+            kept.append(line)
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(kept)).strip()
+
+
+def prepare_llm_text(original_text: str) -> str:
+    """Return the document text as it will be sent to the model, before redaction.
+
+    The text is compressed and oversized documents are cut to
+    settings.max_input_chars, which bounds both the redaction work and the
+    prompt size. The extraction cache keys on this exact text.
+    """
+    max_chars = get_settings().max_input_chars
+    llm_text = _compress_text(original_text)
+    if len(llm_text) > max_chars:
+        llm_text = llm_text[:max_chars]
+    return llm_text
+
+
+def _sanitize_for_llm(original_text: str) -> str:
+    """Redact the LLM-bound text and write original/sanitized copies to PreLLM for audit."""
+    llm_text = prepare_llm_text(original_text)
+    if len(llm_text) < len(original_text):
+        print(f"🗜️ Document compressed/truncated for LLM: {len(original_text)} → {len(llm_text)} chars")
+    sanitized_text = _sanitize_text_string(llm_text)
+
+    # Write both original and sanitized text files for audit
+    prellm_dir = _artifact_dir(PRELLM_DIR)
+    ts = _timestamp()
+    orig_txt_path = prellm_dir / f"original_text_{ts}.txt"
+    san_txt_path = prellm_dir / f"sanitized_text_{ts}.txt"
+    _save_artifact(orig_txt_path, original_text.encode("utf-8"))
+    _save_artifact(san_txt_path, sanitized_text.encode("utf-8"))
+    print(f"✓ Wrote original and sanitized text to: {orig_txt_path}, {san_txt_path}")
+
+    return sanitized_text
+
+
+# Post-processing tables, built once at import instead of on every extraction.
+
+# Explicit market size labels, e.g. "TAM: 735,000,000", "TAM €735M", "TAM 0.5b"
+_EXPLICIT_MARKET_PATTERNS = {
+    label: [
+        re.compile(rf"\b{label}\b\s*[:=]?\s*€?([\d,.]+)(\s*[kmb]|\s*million|\s*billion|\s*bn|\s*b)?\b", re.IGNORECASE),
+        re.compile(rf"\b{label}\b[^\n]*?€\s*([\d,.]+)(\s*[kmb]|\s*million|\s*billion|\s*bn|\s*b)?\b", re.IGNORECASE),
+    ]
+    for label in ("TAM", "SAM", "SOM")
+}
+_MAGNITUDE_SUFFIXES = {
+    "k": 1_000,
+    "m": 1_000_000, "million": 1_000_000,
+    "b": 1_000_000_000, "bn": 1_000_000_000, "billion": 1_000_000_000,
+}
+
+_DEV_FLEET_RE = re.compile(r'development fleet consists of approximately\s+([\d,.]+)')
+# Royalty formula line (motorcycles sold × categories × take rate% × EUR price × market coverage% × royalty%)
+# Example: 210,000 * 10 * 10% * EUR 350 * 50% * 10% = EUR 3,675,000
+_ROYALTY_FORMULA_RE = re.compile(r'([\d,.]+)\s*\*\s*(\d+)\s*\*\s*(\d+)%\s*\*\s*(?:eur\s*)?(\d+(?:,\d{3})*)\s*\*\s*(\d+)%\s*\*\s*(\d+)%')
+_STREAM_SECTION_RE = re.compile(r'stream\s+\d+:.*?(?=stream\s+\d+:|value |confidential|$)', re.IGNORECASE | re.DOTALL)
+_EURO_AMOUNT_RE = re.compile(r'€\s*([\d,.]+)\s*(million)?', re.IGNORECASE)
+
+# Fallback defaults for critical fields still None/0/empty after extraction,
+# so the UI ALWAYS has values even when LLM extraction fails
+EXTRACTION_DEFAULTS = {
+    'fleet_size_or_units': 100000,  # Default fleet/market size
+    'price_per_unit': 500,           # Default price per unit
+    'annual_revenue_or_savings': 10000000,  # Default €10M
+    'development_cost': 500000,      # Default €500k
+    'growth_rate': 5,
+    'royalty_percentage': 10,
+    'take_rate': 10,
+    'market_coverage': 50,
+    'number_of_product_categories': 5
+}
+_EXTERNAL_ENRICHMENT_FIELDS = ('fleet_size_or_units', 'price_per_unit', 'take_rate', 'market_coverage', 'royalty_percentage')
+
+
+def postprocess_extraction(content: str, original_text: str, sanitized_text: str) -> Tuple[ComprehensiveAnalysis, Dict[str, Any]]:
+    """Turn one raw extraction payload into (analysis, extracted).
+
+    Parses the JSON, detects explicit TAM/SAM/SOM overrides, applies heuristic
+    enrichment and fallback defaults, then runs the calculator. Shared by the
+    single-document and batched extraction paths.
+    """
+    # The Json_Results/ artifacts are diagnostics only. With debug off they are
+    # skipped entirely, including the extra NER pass over the extracted values.
+    save_results = get_settings().debug
+    # Prepare results directory early so it's available even if JSON parse fails
+    results_dir = _artifact_dir(RESULTS_DIR) if save_results else None
+    # One stamp per document, shared by its extraction and full-analysis files.
+    timestamp = _timestamp() if save_results else None
+
+    try:
+        # Strict structured outputs return every key, with null for anything
+        # not found. Dropping those restores "missing" semantics, so the
+        # defaults below and the calculator's .get() fallbacks apply to them.
+        extracted = {k: v for k, v in orjson.loads(content).items() if v is not None}
+        
+        if save_results:
+            # The payload has just parsed as valid JSON, so it is saved exactly as
+            # received instead of being re-serialized from the parsed dict.
+            extraction_path = results_dir / f"extraction_{timestamp}.json"
+            _save_artifact(extraction_path, content.encode("utf-8"))
+
+            # Additionally sanitize the extracted dict (defense-in-depth) and save it
+            try:
+                orig_extracted, sanitized_extracted = sanitize_extracted_data(extracted)
+                sanitized_path = results_dir / f"extraction_sanitized_{timestamp}.json"
+                _save_artifact(sanitized_path, orjson.dumps(sanitized_extracted, option=orjson.OPT_INDENT_2))
+                print(f"✓ Sanitized extraction saved: {sanitized_path}")
+            except Exception as e:
+                print(f"⚠️ Failed to sanitize extracted data: {e}")
+
+            print(f"✓ LLM Extraction saved: {extraction_path}")
+        print(f"📊 Extracted Data:")
+        for key, value in extracted.items():
+            print(f"   {key}: {value}")
+        print()
+
+        # ---------------- EXPLICIT TAM/SAM/SOM DETECTION ----------------
+        # We parse the ORIGINAL text (more likely to contain explicit labels)
+        # Fallback to sanitized text if needed.
+        source_for_scan = original_text + "\n" + sanitized_text
+
+        def _parse_explicit(label: str) -> float | None:
+            for pat in _EXPLICIT_MARKET_PATTERNS[label]:
+                m = pat.search(source_for_scan)
+                if m:
+                    raw = m.group(1).replace(',', '')
+                    try:
+                        val = float(raw)
+                    except ValueError:
+                        continue
+                    suffix = (m.group(2) or '').strip().lower()
+                    return val * _MAGNITUDE_SUFFIXES.get(suffix, 1)
+            return None
+
+        explicit_tam = _parse_explicit('TAM')
+        explicit_sam = _parse_explicit('SAM')
+        explicit_som = _parse_explicit('SOM')
+
+        if explicit_tam is not None:
+            extracted['explicit_tam'] = explicit_tam
+            print(f"   🔍 Detected explicit TAM override: €{explicit_tam:,.0f}")
+        if explicit_sam is not None:
+            extracted['explicit_sam'] = explicit_sam
+            print(f"   🔍 Detected explicit SAM override: €{explicit_sam:,.0f}")
+        if explicit_som is not None:
+            extracted['explicit_som'] = explicit_som
+            print(f"   🔍 Detected explicit SOM override: €{explicit_som:,.0f}")
+
+        if any(k in extracted for k in ['explicit_tam', 'explicit_sam', 'explicit_som']):
+            print("   ✅ Explicit market size overrides will take precedence in calculator.")
+
+        # ---------------- HEURISTIC FIELD ENRICHMENT ----------------
+        def _heuristic_field_extraction(src: str) -> Dict[str, Any]:
+            enriched: Dict[str, Any] = {}
+            lower = src.lower()
+
+            # Development fleet size (savings project example)
+            m_fleet = _DEV_FLEET_RE.search(lower)
+            if m_fleet and extracted.get('fleet_size_or_units') in (None, 0, ''):
+                val = int(m_fleet.group(1).replace(',', ''))
+                enriched['fleet_size_or_units'] = val
+
+            # Royalty formula line parsing
+            if extracted.get('royalty_percentage') in (None, 0, '') or extracted.get('number_of_product_categories') in (None, 0, ''):
+                m = _ROYALTY_FORMULA_RE.search(lower)
+                if m:
+                    motorcycles_sold = int(m.group(1).replace(',', ''))
+                    categories = int(m.group(2))
+                    take_rate = float(m.group(3))
+                    price_per_unit = float(m.group(4).replace(',', ''))
+                    market_cov = float(m.group(5))
+                    royalty_pct = float(m.group(6))
+                    if extracted.get('fleet_size_or_units') in (None, 0, '') and 'fleet_size_or_units' not in enriched:
+                        enriched['fleet_size_or_units'] = motorcycles_sold
+                    if extracted.get('number_of_product_categories') in (None, 0, ''):
+                        enriched['number_of_product_categories'] = categories
+                    if extracted.get('take_rate') in (None, 0, ''):
+                        enriched['take_rate'] = take_rate
+                    if extracted.get('price_per_unit') in (None, 0, ''):
+                        enriched['price_per_unit'] = price_per_unit
+                    if extracted.get('market_coverage') in (None, 0, ''):
+                        enriched['market_coverage'] = market_cov
+                    if extracted.get('royalty_percentage') in (None, 0, ''):
+                        enriched['royalty_percentage'] = royalty_pct
+
+            # Stream potentials (savings project) – capture monetary amounts per stream
+            # Patterns like: 'Potential high (> €2 million p.a.), currently €750,000 p.a.' or '€3 million'
+            stream_val = extracted.get('stream_values')
+            if stream_val in (None, [], '') or (isinstance(stream_val, list) and all(v is None for v in stream_val)):
+                stream_section_matches = _STREAM_SECTION_RE.findall(src)
+                stream_amounts = []
+                for section in stream_section_matches:
+                    # collect all euro amounts
+                    for em in _EURO_AMOUNT_RE.finditer(section):
+                        raw = em.group(1).replace(',', '')
+                        try:
+                            val = float(raw)
+                        except ValueError:
+                            continue
+                        if em.group(2):
+                            val *= 1_000_000
+                        stream_amounts.append(val)
+                # Deduplicate & keep reasonable count
+                stream_amounts = list(dict.fromkeys(stream_amounts))
+                if stream_amounts:
+                    enriched['stream_values'] = stream_amounts[:10]
+
+            return enriched
+
+        heuristic_enriched = _heuristic_field_extraction(source_for_scan)
+        if heuristic_enriched:
+            for k, v in heuristic_enriched.items():
+                if k not in extracted or extracted.get(k) in (None, [], ''):
+                    extracted[k] = v
+            print(f"   🔧 Heuristic enrichment added: {', '.join(heuristic_enriched.keys())}")
+        else:
+            print("   ℹ️ No heuristic enrichment applied (patterns not found).")
+
+        # Apply fallback defaults for any critical fields still None/0/empty
+        applied_defaults = []
+        for key, default_value in EXTRACTION_DEFAULTS.items():
+            current = extracted.get(key)
+            # Apply default if None, 0, empty string, or empty list
+            if current is None or current == 0 or current == '' or current == []:
+                extracted[key] = default_value
+                applied_defaults.append(f"{key}={default_value}")
+        
+        if applied_defaults:
+            print(f"   🔧 Fallback defaults applied: {', '.join(applied_defaults)}")
 
-Return ONLY this JSON:
-{{
-  "project_name": "string or null",
-  "project_type": "savings or one_time_sale or subscription or royalty or mixed",
-  "annual_revenue_or_savings": number or null,
-  "fleet_size_or_units": number or null,
-  "price_per_unit": number or null,
-  "stream_values": [number] or null,
-  "development_cost": number or null,
-  "growth_rate": number or null,
-  "royalty_percentage": number or null,
-  "take_rate": number or null,
-  "market_coverage": number or null
-}}"""
-
-def analyze_document_fast(text: str) -> ComprehensiveAnalysis:
-    """Analyze document and return only the analysis (legacy)."""
-    analysis, _ = analyze_document_fast_with_extraction(text)
-    return analysis
-
-
-def analyze_document_fast_with_extraction(text: str) -> tuple:
-    """Analyze document and return both analysis and extraction data.
-
-    Enhancement: Before calling the calculator, we attempt to detect explicitly stated
-    TAM/SAM/SOM values in the source text (the uploaded document). These override any
-    computed values inside the calculator when present.
-
-    We look for patterns like:
-        TAM: 735,000,000
-        SAM €5.2m
-        SOM 120m
-        TAM €735M | SAM €367.5M | SOM €36.75M
-
-    Supported suffixes:
-        k -> *1,000
-        m / million -> *1,000,000
-        b / bn / billion -> *1,000,000,000
+        # External enrichment stub (placeholder for future web lookups)
+        missing_for_external = [k for k in _EXTERNAL_ENRICHMENT_FIELDS if extracted.get(k) in (None,'',0)]
+        if missing_for_external:
+            print(f"   🌐 External data enrichment deferred (missing: {', '.join(missing_for_external)}) – implement web fetch if required.")
+        
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        # ValueError covers orjson.JSONDecodeError and bad numeric strings;
+        # anything else is a genuine bug and propagates to the outer handler.
+        print(f"❌ Extraction parse error ({type(e).__name__}): {e}")
+        logger.warning("Raw content causing error: %.500s", content)
+        extracted = {}
+    
+    print("🧮 Starting calculator with extracted data (including explicit overrides if any)...")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Input to calculator: %s", orjson.dumps(extracted, option=orjson.OPT_INDENT_2).decode())
+    
+    full_analysis = calculate_complete_analysis(extracted)
+    
+    print(f"✓ Calculator completed successfully")
+    
+    if save_results:
+        analysis_path = results_dir / f"full_analysis_{timestamp}.json"
+
+        # Serialized straight from the model by pydantic-core, without an
+        # intermediate model_dump() dict.
+        _save_artifact(analysis_path, full_analysis.model_dump_json(indent=2).encode("utf-8"))
+
+        print(f"✓ Full Analysis saved: {analysis_path}")
+    print(f"\n📊 ANALYSIS SUMMARY:")
+    print(f"   TAM: €{full_analysis.tam.market_size:,.0f}")
+    print(f"   SAM: €{full_analysis.sam.market_size:,.0f}")
+    print(f"   SOM: €{full_analysis.som.revenue_potential:,.0f}")
+    print(f"   ROI: {full_analysis.roi.roi_percentage:.1f}%")
+    print(f"   Break-even: {full_analysis.roi.payback_period_months} months")
+    print(f"   Units: {full_analysis.volume.units_sold:,.0f}")
+    print("="*80 + "\n")
+    
+    return full_analysis, extracted
+
+
+def extract_document(text: str) -> Tuple[Optional[str], str]:
+    """Run the LLM extraction for one document.
+
+    Returns the raw extraction payload and the sanitized text it was produced
+    from - everything postprocess_extraction needs besides the original text.
+    This is the only expensive step, so it is what the result cache stores.
     """
     print("\n" + "="*80)
     print("🚀 STARTING DOCUMENT ANALYSIS")
@@ -220,29 +657,19 @@ def analyze_document_fast_with_extraction(text: str) -> tuple:
         settings = get_settings()
         print(f"✓ Config loaded - OpenAI Key: {settings.openai_api_key[:10]}...")
         
-        client = OpenAI(api_key=settings.openai_api_key)
+        client = get_openai_client()
         
         print(f"📝 Document length: {len(text)} characters")
-        print(f"📝 Document preview (first 200 chars): {text[:200]}...")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Document preview (first 200 chars): %s...", text[:200])
+
+        if _is_blank(text):
+            print("⚠️ No text in document - skipping LLM extraction, defaults will be applied")
+            return "{}", text
 
         # --- SANITIZE RAW DOCUMENT BEFORE SENDING TO LLM ---
         original_text = text
-        sanitized_text = _sanitize_text_string(original_text)
-
-        # Write both original and sanitized text files for audit
-        prellm_dir = Path("PreLLM")
-        prellm_dir.mkdir(exist_ok=True)
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        orig_txt_path = prellm_dir / f"original_text_{ts}.txt"
-        san_txt_path = prellm_dir / f"sanitized_text_{ts}.txt"
-        try:
-            with open(orig_txt_path, "w", encoding="utf-8") as f:
-                f.write(original_text)
-            with open(san_txt_path, "w", encoding="utf-8") as f:
-                f.write(sanitized_text)
-            print(f"✓ Wrote original and sanitized text to: {orig_txt_path}, {san_txt_path}")
-        except Exception as e:
-            print(f"⚠️ Failed to write sanitized/original text files: {e}")
+        sanitized_text = _sanitize_for_llm(original_text)
 
         # Build prompt from the sanitized text only (ensures LLM never sees raw PII)
         prompt = get_minimal_extraction_prompt(sanitized_text)
@@ -250,238 +677,157 @@ def analyze_document_fast_with_extraction(text: str) -> tuple:
         dump_pre_llm(prompt, name_prefix="extraction_prompt")
         print(f"📤 Sending SANITIZED prompt to LLM - Prompt length: {len(prompt)} chars")
         
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=800
-        )
+        # A response cut off at max_tokens is partial JSON, not an extraction.
+        # It is retried once with twice the budget (long stream_values
+        # arrays), and reported as an error rather than parsed if it still
+        # does not fit.
+        for max_tokens in (EXTRACTION_MAX_TOKENS, EXTRACTION_MAX_TOKENS * 2):
+            response = client.chat.completions.create(
+                model=EXTRACTION_MODEL,
+                messages=[
+                    {"role": "system", "content": EXTRACTION_INSTRUCTIONS},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.1,
+                max_tokens=max_tokens,
+                # Structured outputs: the model returns a bare JSON object matching
+                # EXTRACTION_SCHEMA, never wrapped in markdown fences.
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {"name": "financial_extraction", "strict": True, "schema": EXTRACTION_SCHEMA},
+                }
+            )
+            if response.choices[0].finish_reason != "length":
+                break
+            print(f"⚠️ Extraction hit the {max_tokens}-token limit")
+        else:
+            raise ValueError(f"Extraction response truncated at {max_tokens} tokens")
         
         print(f"✓ LLM Response received")
         
-        content = response.choices[0].message.content.strip()
-        
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.startswith("```"):
-            content = content[3:]
-        if content.endswith("```"):
-            content = content[:-3]
-        content = content.strip()
+        # Structured outputs return a bare JSON object and orjson ignores
+        # surrounding whitespace, so the payload is used as-is (no strip() copy).
+        # A refusal has no content; other unfinished responses (content
+        # filter) are dropped the same way and end up on the defaults.
+        content = response.choices[0].message.content
+        if response.choices[0].finish_reason != "stop":
+            print(f"⚠️ Extraction ended with finish_reason={response.choices[0].finish_reason!r} - ignoring payload")
+            content = None
         
-        print(f"📥 LLM Raw Response:\n{content}\n")
+        logger.debug("LLM raw response:\n%s", content)
         
-        # Prepare results directory early so it's available even if JSON parse fails
-        results_dir = Path("Json_Results")
-        results_dir.mkdir(exist_ok=True)
+        return content, sanitized_text
+    except Exception as e:
+        print(f"\n❌ FATAL ERROR in extract_document:")
+        print(f"Error type: {type(e).__name__}")
+        print(f"Error message: {str(e)}")
+        import traceback
+        print(f"Traceback:\n{traceback.format_exc()}")
+        raise
 
-        try:
-            extracted = json.loads(content)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            extraction_path = results_dir / f"extraction_{timestamp}.json"
-            with open(extraction_path, "w", encoding="utf-8") as f:
-                json.dump(extracted, f, indent=2, ensure_ascii=False)
 
-            # Additionally sanitize the extracted dict (defense-in-depth) and save it
-            try:
-                orig_extracted, sanitized_extracted = sanitize_extracted_data(extracted)
-                sanitized_path = results_dir / f"extraction_sanitized_{timestamp}.json"
-                with open(sanitized_path, "w", encoding="utf-8") as f2:
-                    json.dump(sanitized_extracted, f2, indent=2, ensure_ascii=False)
-                print(f"✓ Sanitized extraction saved: {sanitized_path}")
-            except Exception as e:
-                print(f"⚠️ Failed to sanitize extracted data: {e}")
+def is_cacheable_extraction(result: Tuple[Optional[str], str]) -> bool:
+    """True if an extract_document result is a complete, parseable extraction worth caching.
 
-            print(f"✓ LLM Extraction saved: {extraction_path}")
-            print(f"📊 Extracted Data:")
-            for key, value in extracted.items():
-                print(f"   {key}: {value}")
-            print()
-
-            # ---------------- EXPLICIT TAM/SAM/SOM DETECTION ----------------
-            # We parse the ORIGINAL text (more likely to contain explicit labels)
-            # Fallback to sanitized text if needed.
-            source_for_scan = original_text + "\n" + sanitized_text
-
-            def _parse_explicit(label: str) -> float | None:
-                # Regex patterns for a label followed by number and optional suffix
-                # Examples handled: TAM: 735,000,000 | TAM €735M | TAM 735m | TAM 0.5b
-                patterns = [
-                    rf"\b{label}\b\s*[:=]?\s*€?([\d,.]+)(\s*[kmb]|\s*million|\s*billion|\s*bn|\s*b)?\b",
-                    rf"\b{label}\b[^\n]*?€\s*([\d,.]+)(\s*[kmb]|\s*million|\s*billion|\s*bn|\s*b)?\b",
-                ]
-                for pat in patterns:
-                    m = re.search(pat, source_for_scan, flags=re.IGNORECASE)
-                    if m:
-                        raw = m.group(1).replace(',', '')
-                        try:
-                            val = float(raw)
-                        except ValueError:
-                            continue
-                        suffix = (m.group(2) or '').strip().lower()
-                        if suffix in ['k']:
-                            val *= 1_000
-                        elif suffix in ['m', 'million']:
-                            val *= 1_000_000
-                        elif suffix in ['b', 'bn', 'billion']:
-                            val *= 1_000_000_000
-                        return val
-                return None
-
-            explicit_tam = _parse_explicit('TAM')
-            explicit_sam = _parse_explicit('SAM')
-            explicit_som = _parse_explicit('SOM')
-
-            if explicit_tam is not None:
-                extracted['explicit_tam'] = explicit_tam
-                print(f"   🔍 Detected explicit TAM override: €{explicit_tam:,.0f}")
-            if explicit_sam is not None:
-                extracted['explicit_sam'] = explicit_sam
-                print(f"   🔍 Detected explicit SAM override: €{explicit_sam:,.0f}")
-            if explicit_som is not None:
-                extracted['explicit_som'] = explicit_som
-                print(f"   🔍 Detected explicit SOM override: €{explicit_som:,.0f}")
-
-            if any(k in extracted for k in ['explicit_tam', 'explicit_sam', 'explicit_som']):
-                print("   ✅ Explicit market size overrides will take precedence in calculator.")
-
-            # ---------------- HEURISTIC FIELD ENRICHMENT ----------------
-            def _heuristic_field_extraction(src: str) -> Dict[str, Any]:
-                enriched: Dict[str, Any] = {}
-                lower = src.lower()
-
-                # Development fleet size (savings project example)
-                m_fleet = re.search(r'development fleet consists of approximately\s+([\d,.]+)', lower)
-                if m_fleet and extracted.get('fleet_size_or_units') in (None, 0, ''):
-                    val = int(m_fleet.group(1).replace(',', ''))
-                    enriched['fleet_size_or_units'] = val
-
-                # Royalty formula line parsing (motorcycles sold × categories × take rate% × EUR price × market coverage% × royalty%)
-                # Example: 210,000 * 10 * 10% * EUR 350 * 50% * 10% = EUR 3,675,000
-                royalty_patterns = [
-                    re.compile(r'([\d,.]+)\s*\*\s*(\d+)\s*\*\s*(\d+)%\s*\*\s*(?:eur\s*)?(\d+(?:,\d{3})*)\s*\*\s*(\d+)%\s*\*\s*(\d+)%')
-                ]
-                if extracted.get('royalty_percentage') in (None, 0, '') or extracted.get('number_of_product_categories') in (None, 0, ''):
-                    for rp in royalty_patterns:
-                        m = rp.search(src.lower())
-                        if m:
-                            motorcycles_sold = int(m.group(1).replace(',', ''))
-                            categories = int(m.group(2))
-                            take_rate = float(m.group(3))
-                            price_per_unit = float(m.group(4).replace(',', ''))
-                            market_cov = float(m.group(5))
-                            royalty_pct = float(m.group(6))
-                            if extracted.get('fleet_size_or_units') in (None, 0, '') and 'fleet_size_or_units' not in enriched:
-                                enriched['fleet_size_or_units'] = motorcycles_sold
-                            if extracted.get('number_of_product_categories') in (None, 0, ''):
-                                enriched['number_of_product_categories'] = categories
-                            if extracted.get('take_rate') in (None, 0, ''):
-                                enriched['take_rate'] = take_rate
-                            if extracted.get('price_per_unit') in (None, 0, ''):
-                                enriched['price_per_unit'] = price_per_unit
-                            if extracted.get('market_coverage') in (None, 0, ''):
-                                enriched['market_coverage'] = market_cov
-                            if extracted.get('royalty_percentage') in (None, 0, ''):
-                                enriched['royalty_percentage'] = royalty_pct
-                            break
-
-                # Stream potentials (savings project) – capture monetary amounts per stream
-                # Patterns like: 'Potential high (> €2 million p.a.), currently €750,000 p.a.' or '€3 million'
-                stream_val = extracted.get('stream_values')
-                if stream_val in (None, [], '') or (isinstance(stream_val, list) and all(v is None for v in stream_val)):
-                    stream_section_matches = re.findall(r'stream\s+\d+:.*?(?=stream\s+\d+:|value |confidential|$)', src, flags=re.IGNORECASE | re.DOTALL)
-                    stream_amounts = []
-                    euro_pattern = re.compile(r'€\s*([\d,.]+)\s*(million)?', re.IGNORECASE)
-                    for section in stream_section_matches:
-                        # collect all euro amounts
-                        for em in euro_pattern.finditer(section):
-                            raw = em.group(1).replace(',', '')
-                            try:
-                                val = float(raw)
-                            except ValueError:
-                                continue
-                            if em.group(2):
-                                val *= 1_000_000
-                            stream_amounts.append(val)
-                    # Deduplicate & keep reasonable count
-                    stream_amounts = list(dict.fromkeys(stream_amounts))
-                    if stream_amounts:
-                        enriched['stream_values'] = stream_amounts[:10]
-
-                return enriched
-
-            heuristic_enriched = _heuristic_field_extraction(source_for_scan)
-            if heuristic_enriched:
-                for k, v in heuristic_enriched.items():
-                    if k not in extracted or extracted.get(k) in (None, [], ''):
-                        extracted[k] = v
-                print(f"   🔧 Heuristic enrichment added: {', '.join(heuristic_enriched.keys())}")
+    Refusals, filtered responses and payloads that fail to parse are used for
+    the current request only; caching them would pin the document to the
+    fallback defaults.
+    """
+    content, _ = result
+    if content is None:
+        return False
+    try:
+        return isinstance(orjson.loads(content), dict)
+    except orjson.JSONDecodeError:
+        return False
+
+
+def _batch_extraction_request(sanitized_texts: List[str]) -> Dict[str, Any]:
+    """Build the chat.completions.create keyword arguments for a batched extraction."""
+    prompt = get_batch_extraction_prompt(sanitized_texts)
+    dump_pre_llm(prompt, name_prefix="batch_extraction_prompt")
+    print(f"📤 Sending SANITIZED batch prompt to LLM - Prompt length: {len(prompt)} chars")
+    return dict(
+        model=EXTRACTION_MODEL,
+        messages=[
+            # Same leading system message as the single-document path, so
+            # both share the cached prefix.
+            {"role": "system", "content": EXTRACTION_INSTRUCTIONS},
+            {"role": "system", "content": BATCH_EXTRACTION_INSTRUCTIONS},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.1,
+        max_tokens=EXTRACTION_MAX_TOKENS * len(sanitized_texts),
+        response_format={
+            "type": "json_schema",
+            "json_schema": {"name": "financial_extraction_batch", "strict": True, "schema": BATCH_EXTRACTION_SCHEMA},
+        },
+    )
+
+
+def _split_batch_response(content: str, count: int) -> List[Optional[str]]:
+    """Split a batched payload into per-document extraction payloads, ordered by doc_id.
+
+    Documents the model left out - or all of them, if the payload does not
+    parse - come back as None, so callers can tell them apart from a genuine
+    empty extraction and retry them on their own.
+    """
+    by_doc: Dict[int, Dict[str, Any]] = {}
+    try:
+        for item in orjson.loads(content)["analyses"]:
+            by_doc[item.pop("doc_id")] = item
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        print(f"❌ Batch extraction parse error ({type(e).__name__}): {e}")
+    missing = [i for i in range(count) if i not in by_doc]
+    if missing:
+        print(f"⚠️ Batch response has no extraction for {len(missing)} of {count} documents")
+    return [orjson.dumps(by_doc[i]).decode() if i in by_doc else None for i in range(count)]
+
+
+async def extract_documents_batch(texts: List[str]) -> List[Optional[Tuple[str, str]]]:
+    """Batched counterpart of extract_document: one (payload, sanitized text) per input.
+
+    Entries are None for documents the batch response did not cover (or for
+    all of them, if it did not finish normally); callers should retry
+    those through extract_document rather than cache a default.
+
+    The request goes through the async client, so many batches can be in
+    flight on one event loop; the CPU-bound sanitization runs in a worker thread.
+    """
+    print("\n" + "="*80)
+    print(f"🚀 STARTING BATCHED DOCUMENT ANALYSIS ({len(texts)} documents)")
+    print("="*80)
+
+    try:
+        client = get_async_openai_client()
+        sanitized_texts = await asyncio.to_thread(
+            lambda: [text if _is_blank(text) else _sanitize_for_llm(text) for text in texts]
+        )
+
+        # Blank documents are left out of the request and go straight to the defaults.
+        payloads: List[Optional[str]] = ["{}"] * len(texts)
+        llm_indices = [i for i, text in enumerate(texts) if not _is_blank(text)]
+        if llm_indices:
+            response = await client.chat.completions.create(
+                **_batch_extraction_request([sanitized_texts[i] for i in llm_indices])
+            )
+            print(f"✓ LLM Batch response received")
+            finish_reason = response.choices[0].finish_reason
+            if finish_reason != "stop":
+                # Partial or filtered JSON: every document counts as missing
+                # and is retried on its own, with its own output budget.
+                print(f"⚠️ Batch extraction ended with finish_reason={finish_reason!r} - retrying documents individually")
+                split = [None] * len(llm_indices)
             else:
-                print("   ℹ️ No heuristic enrichment applied (patterns not found).")
-
-            # Apply fallback defaults for any critical fields still None/0/empty
-            # This ensures the UI ALWAYS has values even when LLM extraction fails
-            defaults = {
-                'fleet_size_or_units': 100000,  # Default fleet/market size
-                'price_per_unit': 500,           # Default price per unit
-                'annual_revenue_or_savings': 10000000,  # Default €10M
-                'development_cost': 500000,      # Default €500k
-                'growth_rate': 5,
-                'royalty_percentage': 10,
-                'take_rate': 10,
-                'market_coverage': 50,
-                'number_of_product_categories': 5
-            }
-            
-            applied_defaults = []
-            for key, default_value in defaults.items():
-                current = extracted.get(key)
-                # Apply default if None, 0, empty string, or empty list
-                if current is None or current == 0 or current == '' or current == []:
-                    extracted[key] = default_value
-                    applied_defaults.append(f"{key}={default_value}")
-            
-            if applied_defaults:
-                print(f"   🔧 Fallback defaults applied: {', '.join(applied_defaults)}")
-
-            # External enrichment stub (placeholder for future web lookups)
-            missing_for_external = [k for k in ['fleet_size_or_units','price_per_unit','take_rate','market_coverage','royalty_percentage'] if extracted.get(k) in (None,'',0)]
-            if missing_for_external:
-                print(f"   🌐 External data enrichment deferred (missing: {', '.join(missing_for_external)}) – implement web fetch if required.")
-            
-        except Exception as e:
-            print(f"❌ JSON Parse Error: {e}")
-            print(f"Raw content causing error: {content[:500]}")
-            extracted = {}
-        
-        print("🧮 Starting calculator with extracted data (including explicit overrides if any)...")
-        print(f"Input to calculator: {json.dumps(extracted, indent=2)}")
-        
-        full_analysis = calculate_complete_analysis(extracted)
-        
-        print(f"✓ Calculator completed successfully")
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        analysis_path = results_dir / f"full_analysis_{timestamp}.json"
-        
-        analysis_dict = full_analysis.model_dump()
-        with open(analysis_path, "w", encoding="utf-8") as f:
-            json.dump(analysis_dict, f, indent=2, ensure_ascii=False)
-        
-        print(f"✓ Full Analysis saved: {analysis_path}")
-        print(f"\n📊 ANALYSIS SUMMARY:")
-        print(f"   TAM: €{full_analysis.tam.market_size:,.0f}")
-        print(f"   SAM: €{full_analysis.sam.market_size:,.0f}")
-        print(f"   SOM: €{full_analysis.som.revenue_potential:,.0f}")
-        print(f"   ROI: {full_analysis.roi.roi_percentage:.1f}%")
-        print(f"   Break-even: {full_analysis.roi.payback_period_months} months")
-        print(f"   Units: {full_analysis.volume.units_sold:,.0f}")
-        print("="*80 + "\n")
-        
-        return full_analysis, extracted
+                split = _split_batch_response(response.choices[0].message.content, len(llm_indices))
+            for i, payload in zip(llm_indices, split):
+                payloads[i] = payload
+        return [
+            None if payload is None else (payload, sanitized_text)
+            for payload, sanitized_text in zip(payloads, sanitized_texts)
+        ]
     except Exception as e:
-        print(f"\n❌ FATAL ERROR in analyze_document_fast:")
+        print(f"\n❌ FATAL ERROR in extract_documents_batch:")
         print(f"Error type: {type(e).__name__}")
         print(f"Error message: {str(e)}")
         import traceback